@@ -1,26 +1,128 @@
 # api.py
 """
 FastAPI wrapper around the semantic search engine.
+
+With a persisted section index, concurrent /search requests are
+coalesced into micro-batches so that one encoder forward pass and one
+index lookup serve many queries. Live PMC search has no shared work
+to batch, so each request runs in its own worker thread.
 """
 
+import asyncio
+import hmac
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Header, HTTPException
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, Field
 
-from semantic_search_engine import SemanticSearchEngine
+from engine_factory import get_engine
 
-engine = SemanticSearchEngine()
+engine = get_engine()
 API_KEY = "change_this"
 
-app = FastAPI()
+# ---------------- MICRO-BATCHING ----------------
+MAX_BATCH_SIZE = 32
+MAX_WAIT_MS = 10
+MAX_TOP_K = 50
+
+_queue: "asyncio.Queue | None" = None
+
+
+async def _next_batch(queue: asyncio.Queue) -> list:
+    """
+    Wait for one request, then gather more until the batch is full
+    or MAX_WAIT_MS has passed.
+    """
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + MAX_WAIT_MS / 1000
+
+    while len(batch) < MAX_BATCH_SIZE:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+
+    return batch
+
+
+def _settle(future: asyncio.Future, result=None, exc=None):
+    if future.done():  # caller may have disconnected
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+async def _run_batch(batch: list):
+    queries = [query for query, _, _ in batch]
+    # Rank once at the largest (bounded) k; each caller gets its own prefix
+    top_k = max(k for _, k, _ in batch)
+
+    try:
+        responses = await asyncio.to_thread(
+            engine.search_batch, queries, top_k
+        )
+    except Exception:
+        # Keep failures per query: retry each one on its own
+        responses = await asyncio.gather(
+            *[
+                asyncio.to_thread(engine.search, query, k)
+                for query, k, _ in batch
+            ],
+            return_exceptions=True
+        )
+
+    for (_, k, future), response in zip(batch, responses):
+        if isinstance(response, Exception):
+            _settle(future, exc=response)
+        else:
+            response["results"] = response["results"][:k]
+            _settle(future, result=response)
+
+
+async def _batch_worker(queue: asyncio.Queue):
+    while True:
+        batch = await _next_batch(queue)
+        # One batch in flight: the encoder is a single shared model, so
+        # requests arriving meanwhile queue up into the next, larger batch
+        await _run_batch(batch)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _queue
+    _queue = asyncio.Queue()
+    worker = asyncio.create_task(_batch_worker(_queue))
+    try:
+        yield
+    finally:
+        worker.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 
 class Query(BaseModel):
     query: str
-    top_k: int = 5
+    top_k: int = Field(5, ge=1, le=MAX_TOP_K)
 
 
 @app.post("/search")
-def search(q: Query, x_api_key: str = Header(None)):
-    if x_api_key != API_KEY:
+async def search(q: Query, x_api_key: str = Header(None)):
+    # Compare bytes: compare_digest rejects non-ASCII str (headers are latin-1)
+    if not hmac.compare_digest((x_api_key or "").encode(), API_KEY.encode()):
         raise HTTPException(status_code=401, detail="Unauthorized")
-    return engine.search(q.query, q.top_k)
+    if engine.index is None:
+        # Live PMC path: network-bound, nothing to share across requests
+        return await asyncio.to_thread(engine.search, q.query, q.top_k)
+
+    future = asyncio.get_running_loop().create_future()
+    await _queue.put((q.query, q.top_k, future))
+    return await future
@@ -5,8 +5,8 @@ import streamlit as st
 # ---------------- CACHING ----------------
 @st.cache_resource
 def get_engine():
-    from semantic_search_engine import SemanticSearchEngine
-    return SemanticSearchEngine()
+    from engine_factory import get_engine as get_shared_engine
+    return get_shared_engine()
 
 # ---------------- PAGE CONFIG ----------------
 st.set_page_config(
@@ -0,0 +1,137 @@
+# build_index.py
+"""
+Offline Section Index Builder
+
+Responsibilities:
+- Walk a PMC corpus (via topic queries) and extract article sections
+- Embed sections in batches with the production embedding logic
+- Write a FAISS inner-product index + row-aligned section metadata
+- Optionally compress the index with product quantization (PQ),
+  keeping exact fp32 embeddings on disk for reranking (PQ builds only)
+
+Usage:
+    python build_index.py "brain cancer" "tumor metabolism" --max-papers 50
+    python build_index.py "brain cancer" --max-papers 500 --pq
+
+"""
+
+import argparse
+import os
+import pickle
+from typing import List, Dict
+
+import faiss
+import numpy as np
+
+from semantic_search_engine import (
+    SemanticSearchEngine,
+    DEFAULT_INDEX_PATH,
+    DEFAULT_META_PATH,
+    DEFAULT_EMBEDDINGS_PATH,
+)
+
+EMBED_BATCH_SIZE = 64
+
+# Below this size an exact flat index is both faster and exact
+HNSW_MIN_SECTIONS = 10_000
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+
+# 48 sub-quantizers x 8 bits -> 48 bytes per vector (vs 1536 B fp32)
+PQ_SUBQUANTIZERS = 48
+PQ_BITS = 8
+PQ_TRAIN_SAMPLE = 50_000
+
+
+# ---------------- EMBED ----------------
+def embed_sections(
+    engine: SemanticSearchEngine,
+    sections: List[Dict]
+) -> np.ndarray:
+    texts = [s["text"] for s in sections]
+    batches = [
+        engine.embed_texts(texts[i:i + EMBED_BATCH_SIZE])
+        for i in range(0, len(texts), EMBED_BATCH_SIZE)
+    ]
+    return np.vstack(batches).astype(np.float32)
+
+
+# ---------------- INDEX ----------------
+def build_index(embeddings: np.ndarray):
+    """
+    Build an inner-product index (cosine, since embeddings are normalized).
+    """
+    dim = embeddings.shape[1]
+    if len(embeddings) < HNSW_MIN_SECTIONS:
+        index = faiss.IndexFlatIP(dim)
+    else:
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    index.add(embeddings)
+    return index
+
+
+def build_pq_index(embeddings: np.ndarray):
+    """
+    Build a product-quantized inner-product index.
+    Scores are approximate; the engine reranks with exact embeddings.
+    """
+    dim = embeddings.shape[1]
+    if len(embeddings) < 2 ** PQ_BITS:
+        raise SystemExit(
+            f"PQ needs at least {2 ** PQ_BITS} sections to train "
+            f"(got {len(embeddings)}); build without --pq."
+        )
+
+    index = faiss.IndexPQ(
+        dim, PQ_SUBQUANTIZERS, PQ_BITS, faiss.METRIC_INNER_PRODUCT
+    )
+
+    rng = np.random.default_rng(0)
+    n_train = min(len(embeddings), PQ_TRAIN_SAMPLE)
+    sample = embeddings[rng.choice(len(embeddings), n_train, replace=False)]
+    index.train(sample)
+
+    index.add(embeddings)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("queries", nargs="+", help="PMC topic queries to index")
+    parser.add_argument("--max-papers", type=int, default=50)
+    parser.add_argument("--index-path", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--meta-path", default=DEFAULT_META_PATH)
+    parser.add_argument("--embeddings-path", default=DEFAULT_EMBEDDINGS_PATH)
+    parser.add_argument(
+        "--pq", action="store_true",
+        help="compress the index with product quantization"
+    )
+    args = parser.parse_args()
+
+    # Don't load the index being replaced (it may be stale or misaligned)
+    engine = SemanticSearchEngine(index_path=None)
+    sections = engine.collect_sections(args.queries, args.max_papers)
+    if not sections:
+        raise SystemExit("No sections collected; nothing to index.")
+
+    embeddings = embed_sections(engine, sections)
+    index = build_pq_index(embeddings) if args.pq else build_index(embeddings)
+
+    os.makedirs(os.path.dirname(args.index_path) or ".", exist_ok=True)
+    faiss.write_index(index, args.index_path)
+    with open(args.meta_path, "wb") as f:
+        pickle.dump(sections, f, protocol=pickle.HIGHEST_PROTOCOL)
+    if args.pq:
+        # Exact vectors for the rerank stage (memory-mapped at query time)
+        np.save(args.embeddings_path, embeddings)
+    elif os.path.exists(args.embeddings_path):
+        # Exact indexes need no rerank; drop a sidecar from an older PQ build
+        os.remove(args.embeddings_path)
+
+    print(f"Indexed {index.ntotal} sections -> {args.index_path}")
+    engine.close()
+
+
+if __name__ == "__main__":
+    main()
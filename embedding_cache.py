@@ -4,77 +4,165 @@
 
 import os
 import sqlite3
-import pickle
+import threading
 import hashlib
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import numpy as np
 
 
 DEFAULT_DB_PATH = "data/embedding_cache.sqlite"
 
+# Max bound parameters per SELECT ... IN (...) (SQLite default limit is 999)
+_IN_CHUNK = 500
+
+# ---------------- SQL ----------------
+# Constant statement strings let sqlite3's statement cache reuse
+# the prepared statements across calls.
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+SQL_CREATE = """
+    CREATE TABLE IF NOT EXISTS embeddings (
+        text_hash TEXT PRIMARY KEY,
+        embedding BLOB,
+        updated_at TEXT,
+        dim INTEGER
+    )
+"""
+
+SQL_GET = "SELECT embedding, dim FROM embeddings WHERE text_hash = ?"
+
+SQL_GET_MANY = (
+    "SELECT text_hash, embedding, dim FROM embeddings "
+    "WHERE text_hash IN ({placeholders})"
+)
+
+SQL_UPSERT = """
+    INSERT INTO embeddings (text_hash, embedding, updated_at, dim)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(text_hash)
+    DO UPDATE SET
+        embedding = excluded.embedding,
+        updated_at = excluded.updated_at,
+        dim = excluded.dim
+"""
+
 
 def text_hash(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    # Non-cryptographic keying; blake2b is much faster than SHA-256
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _decode(
+    blob: bytes,
+    dim: Optional[int],
+    expected_dim: Optional[int]
+) -> Optional[np.ndarray]:
+    # Rows from another model (different dim) or truncated blobs are misses
+    if dim is None or len(blob) != dim * 4:
+        return None
+    if expected_dim is not None and dim != expected_dim:
+        return None
+    # Read-only view over the row bytes; callers must not mutate it
+    return np.frombuffer(blob, dtype=np.float32)
 
 
 class EmbeddingCache:
     """
     Simple persistent cache for text embeddings.
-    Stores one embedding per text hash.
+    Stores one embedding per text hash as raw float32 bytes.
+    With `dim` set, rows of any other dimension are treated as misses.
     """
 
-    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, dim: Optional[int] = None):
+        self.dim = dim
         os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
-        self.conn = sqlite3.connect(db_path)
+        # Autocommit mode: reads run without implicit transactions,
+        # writes open an explicit one. Shared across request threads;
+        # access is serialized by the lock.
+        self.conn = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None
+        )
+        self._lock = threading.Lock()
         self._init_db()
 
     def _init_db(self):
-        cur = self.conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS embeddings (
-                text_hash TEXT PRIMARY KEY,
-                embedding BLOB,
-                updated_at TEXT
-            )
-            """
-        )
-        self.conn.commit()
+        for pragma in _PRAGMAS:
+            self.conn.execute(pragma)
+        self.conn.execute(SQL_CREATE)
+        # Older caches stored pickled blobs without a dim column;
+        # those rows have dim NULL and are treated as misses.
+        columns = {
+            row[1] for row in self.conn.execute("PRAGMA table_info(embeddings)")
+        }
+        if "dim" not in columns:
+            self.conn.execute("ALTER TABLE embeddings ADD COLUMN dim INTEGER")
 
     def get(self, text: str) -> Optional[np.ndarray]:
         h = text_hash(text)
-        cur = self.conn.cursor()
-        cur.execute(
-            "SELECT embedding FROM embeddings WHERE text_hash = ?",
-            (h,)
-        )
-        row = cur.fetchone()
+        with self._lock:
+            row = self.conn.execute(SQL_GET, (h,)).fetchone()
         if not row:
             return None
-        return pickle.loads(row[0])
+        return _decode(*row, self.dim)
+
+    def get_many(self, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up many texts with batched IN queries.
+        Returns {text: embedding} for cache hits only.
+        """
+        by_hash = {text_hash(text): text for text in texts}
+        hashes: List[str] = list(by_hash)
+        found = {}
+
+        with self._lock:
+            for start in range(0, len(hashes), _IN_CHUNK):
+                chunk = hashes[start:start + _IN_CHUNK]
+                sql = SQL_GET_MANY.format(placeholders=",".join("?" * len(chunk)))
+                for h, blob, dim in self.conn.execute(sql, chunk):
+                    emb = _decode(blob, dim, self.dim)
+                    if emb is not None:
+                        found[by_hash[h]] = emb
+
+        return found
 
     def set(self, text: str, embedding: np.ndarray):
-        h = text_hash(text)
-        emb_blob = pickle.dumps(
-            np.asarray(embedding, dtype=np.float32),
-            protocol=pickle.HIGHEST_PROTOCOL
-        )
-        cur = self.conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO embeddings (text_hash, embedding, updated_at)
-            VALUES (?, ?, ?)
-            ON CONFLICT(text_hash)
-            DO UPDATE SET
-                embedding = excluded.embedding,
-                updated_at = excluded.updated_at
-            """,
-            (h, sqlite3.Binary(emb_blob),
-             datetime.now(timezone.utc).isoformat())
-        )
-        self.conn.commit()
+        self.set_many([(text, embedding)])
+
+    def set_many(self, pairs: Iterable[Tuple[str, np.ndarray]]):
+        """
+        Upsert many embeddings in a single transaction (one commit).
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        rows = []
+        for text, embedding in pairs:
+            emb = np.ascontiguousarray(embedding, dtype=np.float32).ravel()
+            if self.dim is not None and emb.size != self.dim:
+                raise ValueError(
+                    f"Embedding has {emb.size} dims; cache expects {self.dim}"
+                )
+            rows.append((text_hash(text), emb.tobytes(), now, emb.size))
+        if not rows:
+            return
+
+        with self._lock:
+            # Autocommit connection: the transaction must be explicit
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(SQL_UPSERT, rows)
+                # Inside the try: a failed COMMIT (e.g. SQLITE_BUSY) must
+                # not leave the connection stuck in an open transaction
+                self.conn.execute("COMMIT")
+            except BaseException:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise
 
     def close(self):
         self.conn.close()
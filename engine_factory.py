@@ -0,0 +1,16 @@
+# engine_factory.py
+"""
+Process-wide SemanticSearchEngine accessor.
+
+API, UI and evaluation entry points share one engine (and one copy of
+the model weights) regardless of import order.
+"""
+
+from functools import lru_cache
+
+from semantic_search_engine import SemanticSearchEngine
+
+
+@lru_cache(maxsize=1)
+def get_engine() -> SemanticSearchEngine:
+    return SemanticSearchEngine()
@@ -1,18 +1,59 @@
+import hashlib
+import os
+
+import joblib
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
+DEFAULT_CACHE_PATH = os.path.join("data", "tfidf.joblib")
+
+
+def corpus_hash(documents):
+    h = hashlib.sha256()
+    for doc in documents:
+        h.update(doc.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
 class TfidfSearch:
-    def __init__(self, documents):
+    def __init__(self, documents, cache_path=DEFAULT_CACHE_PATH):
+        self.docs = documents
+        doc_hash = corpus_hash(documents)
+
+        # Reuse the fitted model when it was built from the same corpus
+        if cache_path and os.path.exists(cache_path):
+            state = joblib.load(cache_path)
+            if state.get("corpus_hash") == doc_hash:
+                self.vectorizer = state["vectorizer"]
+                self.doc_vectors = state["doc_vectors"]
+                return
+
         self.vectorizer = TfidfVectorizer(
             stop_words="english",
             max_features=5000
         )
-        self.docs = documents
         self.doc_vectors = self.vectorizer.fit_transform(documents)
 
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            joblib.dump(
+                {
+                    "corpus_hash": doc_hash,
+                    "vectorizer": self.vectorizer,
+                    "doc_vectors": self.doc_vectors,
+                },
+                cache_path
+            )
+
     def search(self, query, top_k=5):
         query_vec = self.vectorizer.transform([query])
-        scores = cosine_similarity(query_vec, self.doc_vectors)[0]
-        top_indices = np.argsort(scores)[::-1][:top_k]
+        # TF-IDF rows are L2-normalized, so the sparse dot is cosine similarity
+        scores = (query_vec @ self.doc_vectors.T).toarray().ravel()
+        # O(N) partial selection, then sort only the top-k
+        k = min(top_k, len(scores))
+        if k == 0:
+            return np.array([], dtype=int)
+        idx = np.argpartition(-scores, k - 1)[:k]
+        top_indices = idx[np.argsort(-scores[idx])]
         return top_indices
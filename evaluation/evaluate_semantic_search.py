@@ -1,7 +1,12 @@
+import json
+import os
+
 import numpy as np
 
-from baseline_tfidf import TfidfSearch
-from semantic_search_engine import SemanticSearchEngine
+from baseline_tfidf import TfidfSearch, corpus_hash
+from topk_kernel import topk_ip
+from engine_factory import get_engine
+from semantic_search_engine import MODEL_NAME
 
 
 # ----------------------------
@@ -26,7 +31,43 @@ print(f"Evaluating on {len(documents)} documents")
 # Initialize engines
 # ----------------------------
 tfidf_engine = TfidfSearch(documents)
-semantic_engine = SemanticSearchEngine()
+semantic_engine = get_engine()
+
+
+# ----------------------------
+# Persisted document embeddings
+# ----------------------------
+EMBEDDINGS_PATH = os.path.join("data", "eval_embeddings.npy")
+EMBEDDINGS_META_PATH = os.path.join("data", "eval_embeddings.json")
+
+
+def load_or_embed(engine, documents):
+    """
+    Return a read-only memory-mapped (N, dim) float32 matrix of document
+    embeddings, re-encoding when the corpus or the encoder setup changed.
+    """
+    # fp16 on GPU vs fp32 on CPU give slightly different vectors
+    weights = next(engine.model.parameters())
+    meta = {
+        "corpus_hash": corpus_hash(documents),
+        "rows": len(documents),
+        "model": MODEL_NAME,
+        "device": weights.device.type,
+        "dtype": str(weights.dtype),
+        "normalize": True,  # embed_texts returns L2-normalized vectors
+    }
+
+    if os.path.exists(EMBEDDINGS_PATH) and os.path.exists(EMBEDDINGS_META_PATH):
+        with open(EMBEDDINGS_META_PATH) as f:
+            if json.load(f) == meta:
+                return np.load(EMBEDDINGS_PATH, mmap_mode="r")
+
+    os.makedirs(os.path.dirname(EMBEDDINGS_PATH), exist_ok=True)
+    np.save(EMBEDDINGS_PATH, engine.embed_texts(documents).astype(np.float32))
+    with open(EMBEDDINGS_META_PATH, "w") as f:
+        json.dump(meta, f)
+
+    return np.load(EMBEDDINGS_PATH, mmap_mode="r")
 
 
 # ----------------------------
@@ -58,9 +99,9 @@ tfidf_p, semantic_p = [], []
 tfidf_r, semantic_r = [], []
 
 # ----------------------------
-# Precompute embeddings once
+# Precompute embeddings once (reused across runs)
 # ----------------------------
-doc_embeddings = semantic_engine.embed_texts(documents)
+doc_embeddings = load_or_embed(semantic_engine, documents)
 
 # ----------------------------
 # Evaluation loop
@@ -75,10 +116,9 @@ for i, q in enumerate(queries):
 
     # ---- Semantic (larger candidate pool) ----
     query_embedding = semantic_engine.embed_texts([q])[0]
-    scores = doc_embeddings @ query_embedding
 
     # IMPORTANT: rank over more candidates, then cut to top_k
-    semantic_results = np.argsort(scores)[::-1][:10]
+    semantic_results = topk_ip(doc_embeddings, query_embedding, 10)
 
     semantic_p.append(precision_at_k(semantic_results, relevance[i]))
     semantic_r.append(recall_at_k(semantic_results, relevance[i]))
@@ -7,26 +7,35 @@ Original file is located at
     https://colab.research.google.com/drive/1oaFDXVMuwAABPdN94uPyjsZl6X8QS72F
 """
 
-from pmc_client import search_pmc, fetch_pmc_xml, extract_sections
+import asyncio
+
+from pmc_client import create_client, search_pmc, fetch_pmc_xml, extract_sections
+
+
+async def _fetch_corpus(query, max_papers):
+    async with create_client() as client:
+        pmcids = await search_pmc(query, client, max_papers=max_papers)
+        return await asyncio.gather(*[
+            fetch_pmc_xml(pmcid, client) for pmcid in pmcids
+        ])
 
 def load_documents(max_papers=10, min_len=300):
     """
     Build a small, fixed corpus for evaluation.
     This is ONLY for benchmarking, not production.
     """
-    pmcids = search_pmc(
+    articles = asyncio.run(_fetch_corpus(
         query="semantic vector search embeddings",
         max_papers=max_papers
-    )
+    ))
 
     documents = []
 
-    for pmcid in pmcids:
-        root = fetch_pmc_xml(pmcid)
-        if root is None:
+    for xml_bytes in articles:
+        if xml_bytes is None:
             continue
 
-        for _, text in extract_sections(root):
+        for _, text in extract_sections(xml_bytes):
             if text and len(text) >= min_len:
                 documents.append(text)
 
@@ -41,7 +50,7 @@ documents[:1][0][:500]
 import time
 import numpy as np
 from baseline_tfidf import TfidfSearch
-from semantic_search_engine import SemanticSearchEngine
+from engine_factory import get_engine
 
 queries = [
     "semantic document retrieval",
@@ -53,7 +62,7 @@ queries = [
 
 # Initialize engines
 tfidf_engine = TfidfSearch(documents)
-semantic_engine = SemanticSearchEngine()
+semantic_engine = get_engine()
 
 # Manual relevance labels (simple + illustrative)
 # Pick 2–3 docs per query after inspecting results once
@@ -82,7 +91,9 @@ for i, q in enumerate(queries):
     doc_embeddings = semantic_engine.embed_texts(documents)
     query_embedding = semantic_engine.embed_texts([q])[0]
     scores = doc_embeddings @ query_embedding
-    semantic_results = np.argsort(scores)[::-1][:5]
+    k = min(5, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    semantic_results = top[np.argsort(-scores[top])]
 
     semantic_scores.append(
         precision_at_k(semantic_results, relevance[i])
@@ -9,18 +9,59 @@ Responsibilities:
 
 """
 
+import asyncio
 import os
-import requests
-import xml.etree.ElementTree as ET
+import sqlite3
+import threading
+import time
+from io import BytesIO
+import httpx
+from lxml import etree
 from typing import List, Tuple, Optional
 
 # ---------------- ENDPOINTS ----------------
 EPMC_SEARCH_URL = "https://www.ebi.ac.uk/europepmc/webservices/rest/search"
 NCBI_EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
 
+# ---------------- HTTP CLIENT ----------------
+MAX_CONNECTIONS = 20
+
+
+def create_client() -> httpx.AsyncClient:
+    """
+    Pooled HTTP/2 client; reuse one instance so TLS handshakes
+    happen once and concurrent requests share multiplexed connections.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_CONNECTIONS
+        )
+    )
+
+
 # ---------------- LOCAL XML CACHE ----------------
-PMC_CACHE_DIR = os.path.join("data", "pmc_cache")
-os.makedirs(PMC_CACHE_DIR, exist_ok=True)
+PMC_CACHE_DB = os.path.join("data", "pmc_cache.sqlite")
+PMC_CACHE_TTL_DAYS = 30
+os.makedirs(os.path.dirname(PMC_CACHE_DB), exist_ok=True)
+
+# One shared connection instead of a file (stat + open) per article
+_cache_conn = sqlite3.connect(PMC_CACHE_DB, check_same_thread=False)
+_cache_lock = threading.Lock()
+with _cache_lock:
+    _cache_conn.execute("PRAGMA journal_mode=WAL")
+    _cache_conn.execute("PRAGMA synchronous=NORMAL")
+    _cache_conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS xml_cache (
+            pmcid TEXT PRIMARY KEY,
+            xml BLOB,
+            fetched_at REAL
+        )
+        """
+    )
+    _cache_conn.commit()
 
 
 # ---------------- UTILITIES ----------------
@@ -35,18 +76,65 @@ def _normalize_pmcid(val: str) -> str:
     return ""
 
 
-def _xml_cache_path(pmcid: str) -> str:
-    return os.path.join(PMC_CACHE_DIR, f"{pmcid}.xml")
-
-
-def _text(elem: Optional[ET.Element]) -> str:
+def _cache_get(
+    pmcid: str,
+    ttl_days: float
+) -> Optional[Tuple[bytes, bool]]:
+    """
+    Returns (xml_bytes, is_stale), or None if the article is not cached.
+    """
+    with _cache_lock:
+        row = _cache_conn.execute(
+            "SELECT xml, fetched_at FROM xml_cache WHERE pmcid = ?",
+            (pmcid,)
+        ).fetchone()
+    if not row:
+        return None
+    xml_bytes, fetched_at = row
+    # Stale rows are still returned: the caller re-fetches, but falls
+    # back to them when the network is unavailable
+    return xml_bytes, time.time() - fetched_at > ttl_days * 86400
+
+
+def _cache_put(pmcid: str, xml_bytes: bytes) -> None:
+    with _cache_lock, _cache_conn:
+        _cache_conn.execute(
+            """
+            INSERT INTO xml_cache (pmcid, xml, fetched_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(pmcid)
+            DO UPDATE SET
+                xml = excluded.xml,
+                fetched_at = excluded.fetched_at
+            """,
+            (pmcid, xml_bytes, time.time())
+        )
+
+
+def _text(elem: Optional[etree._Element]) -> str:
     if elem is None:
         return ""
     return " ".join(elem.itertext()).strip()
 
 
+def _release(elem: etree._Element) -> None:
+    """
+    Free a consumed section and the already-processed sections before it.
+    Other siblings (e.g. body-level <p>) stay for the paragraph fallback.
+    """
+    elem.clear(keep_tail=True)
+    parent = elem.getparent()
+    for prev in list(elem.itersiblings("sec", preceding=True)):
+        parent.remove(prev)
+
+
 # ---------------- SEARCH ----------------
-def search_pmc(query: str, max_papers: int = 10, timeout: int = 15) -> List[str]:
+async def search_pmc(
+    query: str,
+    client: httpx.AsyncClient,
+    max_papers: int = 10,
+    timeout: int = 15
+) -> List[str]:
     """
     Search Europe PMC for open-access articles.
     Returns a list of normalized PMCIDs.
@@ -58,7 +146,7 @@ def search_pmc(query: str, max_papers: int = 10, timeout: int = 15) -> List[str]
         "resultType": "core",
     }
 
-    resp = requests.get(EPMC_SEARCH_URL, params=params, timeout=timeout)
+    resp = await client.get(EPMC_SEARCH_URL, params=params, timeout=timeout)
     resp.raise_for_status()
 
     results = resp.json().get("resultList", {}).get("result", [])
@@ -77,26 +165,35 @@ def search_pmc(query: str, max_papers: int = 10, timeout: int = 15) -> List[str]
 
 
 # ---------------- FETCH ----------------
-def fetch_pmc_xml(
+async def fetch_pmc_xml(
     pmcid: str,
+    client: httpx.AsyncClient,
     timeout: int = 20,
-    use_cache: bool = True
-) -> Optional[ET.Element]:
+    use_cache: bool = True,
+    ttl_days: float = PMC_CACHE_TTL_DAYS
+) -> Optional[bytes]:
     """
-    Fetch PMC article XML using NCBI efetch.
-    Cached locally to avoid repeated network calls.
+    Fetch PMC article XML (raw bytes) using NCBI efetch.
+    Cached locally (SQLite, re-fetched after ttl_days)
+    to avoid repeated network calls; a stale copy is served
+    if the re-fetch fails.
     """
     pmc = _normalize_pmcid(pmcid)
     if not pmc:
         return None
 
-    cache_path = _xml_cache_path(pmc)
-
-    if use_cache and os.path.exists(cache_path):
+    stale = None
+    if use_cache:
         try:
-            return ET.fromstring(open(cache_path, "rb").read())
-        except Exception:
-            pass  # fall through to re-fetch
+            # SQLite is blocking; keep it off the shared I/O event loop
+            cached = await asyncio.to_thread(_cache_get, pmc, ttl_days)
+        except sqlite3.Error:
+            cached = None  # fall through to re-fetch
+        if cached is not None:
+            xml_bytes, is_stale = cached
+            if not is_stale:
+                return xml_bytes
+            stale = xml_bytes
 
     params = {
         "db": "pmc",
@@ -105,49 +202,77 @@ def fetch_pmc_xml(
     }
 
     try:
-        resp = requests.get(NCBI_EFETCH_URL, params=params, timeout=timeout)
+        resp = await client.get(NCBI_EFETCH_URL, params=params, timeout=timeout)
         resp.raise_for_status()
         xml_bytes = resp.content
 
         try:
-            with open(cache_path, "wb") as f:
-                f.write(xml_bytes)
-        except Exception:
+            await asyncio.to_thread(_cache_put, pmc, xml_bytes)
+        except sqlite3.Error:
             pass
 
-        return ET.fromstring(xml_bytes)
+        return xml_bytes
     except Exception:
-        return None
+        return stale
 
 
 # ---------------- EXTRACT ----------------
-def extract_sections(root: Optional[ET.Element]) -> List[Tuple[str, str]]:
+def extract_sections(xml_bytes: Optional[bytes]) -> List[Tuple[str, str]]:
     """
     Extract readable sections from a PMC article.
     Returns a list of (section_title, section_text).
-    """
-    if root is None:
-        return []
 
-    body = root.find(".//body")
-    if body is None:
+    Streams the XML with iterparse and frees each top-level section
+    once consumed, so the full tree is never held in memory.
+    """
+    if not xml_bytes:
         return []
 
-    sections = []
+    # Slots are reserved on "start" so nested sections (which end before
+    # their parent) still come out in document order
+    slots: List[Optional[Tuple[str, str]]] = []
+    open_slots: List[Optional[int]] = []
+    paragraphs = []
 
-    for sec in body.findall(".//sec"):
-        title = _text(sec.find("title")) or "Section"
-        text = _text(sec)
-        if text:
-            sections.append((title, text))
+    try:
+        for event, elem in etree.iterparse(
+            BytesIO(xml_bytes),
+            events=("start", "end"),
+            tag=("sec", "body"),
+            resolve_entities=False,
+            huge_tree=True
+        ):
+            if elem.tag == "body":
+                if event == "end":
+                    # Fallback: paragraph-level extraction
+                    if not any(slots):
+                        paragraphs = [_text(p) for p in elem.iter("p")]
+                    break
+                continue
+
+            if event == "start":
+                in_body = next(elem.iterancestors("body"), None) is not None
+                open_slots.append(len(slots) if in_body else None)
+                if in_body:
+                    slots.append(None)
+                continue
+
+            slot = open_slots.pop()
+            if slot is not None:
+                title = _text(elem.find("title")) or "Section"
+                text = _text(elem)
+                if text:
+                    slots[slot] = (title, text)
+
+            # Nested sections stay attached so their parent's text is complete
+            if next(elem.iterancestors("sec"), None) is None:
+                _release(elem)
+    except etree.XMLSyntaxError:
+        pass
+
+    sections = [section for section in slots if section is not None]
 
     if sections:
         return sections
 
-    # Fallback: paragraph-level extraction
-    for p in body.findall(".//p"):
-        text = _text(p)
-        if text:
-            sections.append(("Paragraph", text))
-
-    return sections
+    return [("Paragraph", text) for text in paragraphs if text]
@@ -3,41 +3,229 @@
 Semantic Search Engine for Biomedical Literature (PMC)
 
 Responsibilities:
-- Retrieve live open-access PMC articles via pmc_client
+- Query a persisted FAISS index of pre-embedded PMC sections
+  (built offline by build_index.py)
+- Fall back to live open-access PMC articles via pmc_client
 - Encode article sections using transformer embeddings
 - Rank sections using cosine similarity
 - Generate complete sentence, meaningful summaries
 
 """
 
+import asyncio
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from functools import lru_cache
+import os
+import pickle
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict
+import threading
+import time
+from typing import List, Dict, Optional
 
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
-from pmc_client import search_pmc, fetch_pmc_xml, extract_sections
+from embedding_cache import EmbeddingCache
+from pmc_client import (
+    create_client,
+    search_pmc,
+    fetch_pmc_xml,
+    extract_sections,
+)
+
+try:
+    import faiss
+except ImportError:  # index search is optional; live search still works
+    faiss = None
+
+
+# ---------------- ENCODER ----------------
+MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_BATCH_SIZE = 128
+QUERY_LRU_SIZE = 1024
+
+# ---------------- PERSISTED INDEX ----------------
+DEFAULT_INDEX_PATH = os.path.join("data", "sections.faiss")
+DEFAULT_META_PATH = os.path.join("data", "sections_meta.pkl")
+DEFAULT_EMBEDDINGS_PATH = os.path.join("data", "sections_embeddings.npy")
+
+# Candidates pulled from the (possibly quantized) index before exact rerank
+RERANK_CANDIDATES = 100
+
+# ---------------- SUMMARY ----------------
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+# ---------------- PROFILING ----------------
+@contextmanager
+def _phase(timings: Optional[Dict[str, int]], name: str):
+    """
+    Accumulate elapsed nanoseconds for a search phase into `timings`.
+    No-op when timings is None.
+    """
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0) + time.perf_counter_ns() - start
+
+
+# ---------------- MODEL ----------------
+@lru_cache(maxsize=1)
+def load_model() -> SentenceTransformer:
+    """
+    Load the embedding model once per process; every engine instance
+    shares the same weights.
+    """
+    # fp16 on GPU halves activation bytes and uses tensor cores
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = SentenceTransformer(MODEL_NAME, device=device)
+    if device == "cuda":
+        model.half()
+    return model
 
 
 class SemanticSearchEngine:
     """
-    Embedding-based semantic search engine over live PMC content.
+    Embedding-based semantic search engine over PMC content.
+
+    Uses the persisted section index when available, otherwise
+    fetches and embeds live PMC articles per query.
     """
 
-    def __init__(self):
-        # Core embedding model (fast + high quality)
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+    def __init__(
+        self,
+        index_path: Optional[str] = DEFAULT_INDEX_PATH,
+        meta_path: str = DEFAULT_META_PATH,
+        embeddings_path: str = DEFAULT_EMBEDDINGS_PATH
+    ):
+        # Core embedding model (fast + high quality), shared per process
+        self.model = load_model()
+
+        # Query embeddings: in-memory LRU in front of the SQLite cache
+        self.cache = EmbeddingCache(
+            dim=self.model.get_sentence_embedding_dimension()
+        )
+        self._query_lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_lru_lock = threading.Lock()
+
+        # Dedicated I/O event loop owning one persistent HTTP/2 client,
+        # so connections survive across searches (and calling threads)
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self._loop.run_forever, name="pmc-io", daemon=True
+        ).start()
+        self._client = create_client()
+
+        # Pre-embedded sections; metadata and exact embeddings
+        # are row-aligned with the index (index_path=None skips loading)
+        self.index = None
+        self.sections: List[Dict] = []
+        self.section_embeddings = None
+        if (
+            faiss is not None
+            and index_path is not None
+            and os.path.exists(index_path)
+            and os.path.exists(meta_path)
+        ):
+            self.index = faiss.read_index(index_path)
+            with open(meta_path, "rb") as f:
+                self.sections = pickle.load(f)
+            if os.path.exists(embeddings_path):
+                self.section_embeddings = np.load(
+                    embeddings_path, mmap_mode="r"
+                )
+            self._check_index_alignment()
+
+    def _check_index_alignment(self):
+        """
+        Index ids are row numbers into the metadata (and exact embeddings);
+        a partial rebuild or mismatched paths would silently mis-map them.
+        """
+        if self.index.ntotal != len(self.sections):
+            raise ValueError(
+                f"Section index has {self.index.ntotal} vectors but metadata "
+                f"has {len(self.sections)} rows; rebuild with build_index.py."
+            )
+        if (
+            self.section_embeddings is not None
+            and self.section_embeddings.shape[0] != self.index.ntotal
+        ):
+            raise ValueError(
+                f"Exact embeddings have {self.section_embeddings.shape[0]} "
+                f"rows but the section index has {self.index.ntotal} vectors; "
+                "rebuild with build_index.py."
+            )
 
     # ---------------- EMBEDDING ----------------
-    def _embed(self, texts: List[str]):
+    def _embed(self, texts: List[str], normalize: bool = True):
         """
-        Encode texts into normalized embedding vectors.
+        Encode texts into embedding vectors.
+        L2 normalization (default) is fused into the encoder, so no
+        extra NumPy pass is needed; pass normalize=False for raw vectors.
         """
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
-        norms = (embeddings ** 2).sum(axis=1, keepdims=True) ** 0.5
-        return embeddings / norms
+        embeddings = self.model.encode(
+            texts,
+            batch_size=EMBED_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=normalize,
+            show_progress_bar=False
+        )
+        # fp16 encoders return fp16 arrays; BLAS sgemv and FAISS expect
+        # C-contiguous fp32, so guarantee it once here (no hidden copies later)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
     
+    def _embed_queries(self, queries: List[str]):
+        """
+        Embed queries, rows aligned with `queries`.
+        Hot queries come from the in-memory LRU; the misses go through
+        the persistent cache and a single batched encode.
+        """
+        found = {}
+        with self._query_lru_lock:
+            for query in queries:
+                embedding = self._query_lru.get(query)
+                if embedding is not None:
+                    self._query_lru.move_to_end(query)
+                    found[query] = embedding
+
+        missing = list(dict.fromkeys(q for q in queries if q not in found))
+        if missing:
+            new_embeddings = self._embed_documents(missing)
+            found.update(zip(missing, new_embeddings))
+            with self._query_lru_lock:
+                self._query_lru.update(zip(missing, new_embeddings))
+                while len(self._query_lru) > QUERY_LRU_SIZE:
+                    self._query_lru.popitem(last=False)
+
+        return np.vstack([found[query] for query in queries])
+
+    def _embed_query(self, query: str):
+        return self._embed_queries([query])[0]
+
+    def _embed_documents(self, texts: List[str]):
+        """
+        Embed many texts, rows aligned with `texts`.
+        Identical texts are encoded once; cached ones are fetched with a
+        single batched lookup and only unseen texts hit the encoder.
+        """
+        unique = list(dict.fromkeys(texts))
+        found = self.cache.get_many(unique)
+        missing = [text for text in unique if text not in found]
+
+        if missing:
+            new_embeddings = self._embed(missing)
+            found.update(zip(missing, new_embeddings))
+            self.cache.set_many(zip(missing, new_embeddings))
+
+        return np.vstack([found[text] for text in texts])
+
      # ---------------- PUBLIC EMBEDDING API ----------------
     def embed_texts(self, texts: List[str]):
         """
@@ -61,7 +249,17 @@ class SemanticSearchEngine:
         if not text:
             return ""
 
-        sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+        # Only the head of long sections can reach the summary
+        text = text.strip()
+        head = text[: max_chars * 2]
+        sentences = _SENT_SPLIT.split(head)
+        if len(head) < len(text):
+            sentences.pop()  # may be cut mid-sentence
+            # The summary needs the cut sentence (or the head had no
+            # boundary at all): fall back to splitting the full text
+            complete_len = sum(len(sentence.strip()) for sentence in sentences)
+            if complete_len < min(min_chars, max_chars):
+                sentences = _SENT_SPLIT.split(text)
 
         summary_parts = []
         total_len = 0
@@ -84,15 +282,22 @@ class SemanticSearchEngine:
         return " ".join(summary_parts)
 
     # ---------------- FETCH + EXTRACT ----------------
-    def _fetch_and_extract(self, pmcid: str) -> List[Dict]:
+    def _run(self, coro):
+        """
+        Run a coroutine on the I/O loop and wait for its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _fetch_and_extract(self, pmcid: str) -> List[Dict]:
         """
         Fetch PMC XML and extract usable text sections.
-        Designed for parallel execution.
+        Designed for concurrent execution.
         """
         documents = []
         try:
-            root = fetch_pmc_xml(pmcid)
-            for section, text in extract_sections(root):
+            xml_bytes = await fetch_pmc_xml(pmcid, self._client)
+            sections = await asyncio.to_thread(extract_sections, xml_bytes)
+            for section, text in sections:
                 if text and len(text.strip()) > 200:
                     documents.append({
                         "pmcid": pmcid,
@@ -104,10 +309,110 @@ class SemanticSearchEngine:
 
         return documents
 
+    async def _fetch_all(self, pmcids: List[str]) -> List[Dict]:
+        """
+        Fetch and extract all articles concurrently.
+        """
+        batches = await asyncio.gather(*[
+            self._fetch_and_extract(pmcid) for pmcid in pmcids
+        ])
+        return [doc for batch in batches for doc in batch]
+
+    async def _search_and_fetch(self, query: str, max_papers: int) -> List[Dict]:
+        pmcids = await search_pmc(query, self._client, max_papers=max_papers)
+        return await self._fetch_all(pmcids)
+
+    async def _collect_sections(
+        self,
+        queries: List[str],
+        max_papers: int
+    ) -> List[Dict]:
+        batches = await asyncio.gather(*[
+            search_pmc(query, self._client, max_papers=max_papers)
+            for query in queries
+        ])
+        # Deduplicate across queries, keeping first-seen order
+        pmcids = list(dict.fromkeys(p for batch in batches for p in batch))
+        return await self._fetch_all(pmcids)
+
+    def collect_sections(
+        self,
+        queries: List[str],
+        max_papers: int = 10
+    ) -> List[Dict]:
+        """
+        Public helper for offline indexing.
+        Fetches usable sections of every PMC article matching the queries,
+        each article once, using the same extraction as live search.
+        """
+        return self._run(self._collect_sections(queries, max_papers))
+
+    # ---------------- RESULT FORMAT ----------------
+    def _format_result(self, doc: Dict, score: float) -> Dict:
+        return {
+            "pmcid": doc["pmcid"],
+            "section": doc["section"],
+            "score": float(score),
+            "summary": self._build_full_sentence_summary(doc["text"]),
+            "link": f"https://pmc.ncbi.nlm.nih.gov/articles/{doc['pmcid']}/"
+        }
+
+    # ---------------- INDEX SEARCH ----------------
+    def _search_index(self, query_embeddings, top_k: int) -> List[List[Dict]]:
+        """
+        Rank pre-embedded sections with the FAISS index,
+        one result list per query embedding row.
+        Embeddings are L2-normalized, so inner product == cosine.
+
+        When exact embeddings are stored, the index only proposes
+        candidates (PQ scores are approximate) and the final order
+        comes from exact fp32 dot products.
+        """
+        if self.section_embeddings is None:
+            scores, ids = self.index.search(query_embeddings, top_k)
+            return [
+                [
+                    self._format_result(self.sections[i], score)
+                    for score, i in zip(row_scores, row_ids)
+                    if i >= 0
+                ]
+                for row_scores, row_ids in zip(scores, ids)
+            ]
+
+        n_candidates = max(top_k, RERANK_CANDIDATES)
+        _, ids = self.index.search(query_embeddings, n_candidates)
+
+        results = []
+        for query_embedding, row_ids in zip(query_embeddings, ids):
+            candidates = np.sort(row_ids[row_ids >= 0])
+            exact_scores = np.dot(
+                self.section_embeddings[candidates], query_embedding
+            )
+            order = np.argsort(-exact_scores)[:top_k]
+            results.append([
+                self._format_result(
+                    self.sections[candidates[j]], exact_scores[j]
+                )
+                for j in order
+            ])
+        return results
+
     # ---------------- SEARCH ----------------
-    def search(self, query: str, top_k: int = 5) -> Dict:
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        timings: Optional[Dict[str, int]] = None
+    ) -> Dict:
         """
-        Perform semantic search over live PMC articles.
+        Perform semantic search over PMC sections.
+
+        Uses the persisted index when loaded; otherwise
+        fetches and ranks live PMC articles.
+
+        If `timings` is given, elapsed nanoseconds per phase are
+        added under "io" (PMC search + fetch), "embed" (encoder or
+        cache) and "search" (ranking + summaries).
 
         Returns:
         {
@@ -125,18 +430,24 @@ class SemanticSearchEngine:
         }
         """
 
-        pmcids = search_pmc(query, max_papers=top_k * 2)
-
-        documents = []
+        if self.index is not None:
+            with _phase(timings, "embed"):
+                query_embedding = self._embed_query(query)
+            with _phase(timings, "search"):
+                results = self._search_index(
+                    query_embedding[None, :], top_k
+                )[0]
+            return {
+                "query": query,
+                "retrieved_at": datetime.now(timezone.utc).isoformat(),
+                "results": results
+            }
 
-        # Parallel network fetching (I/O optimized)
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [
-                executor.submit(self._fetch_and_extract, pmcid)
-                for pmcid in pmcids
-            ]
-            for future in as_completed(futures):
-                documents.extend(future.result())
+        with _phase(timings, "io"):
+            # Concurrent network fetching; XML parsing overlaps other fetches
+            documents = self._run(
+                self._search_and_fetch(query, max_papers=top_k * 2)
+            )
 
         if not documents:
             return {
@@ -146,31 +457,62 @@ class SemanticSearchEngine:
             }
 
         # ---------------- EMBEDDINGS (CORE LOGIC) ----------------
-        doc_texts = [doc["text"] for doc in documents]
-        doc_embeddings = self._embed(doc_texts)
-
-        query_embedding = self._embed([query])[0]
-        scores = doc_embeddings @ query_embedding
+        # All sections from all articles go through one batched encode
+        with _phase(timings, "embed"):
+            doc_texts = [doc["text"] for doc in documents]
+            doc_embeddings = self._embed_documents(doc_texts)
+            query_embedding = self._embed_query(query)
 
-        ranked = sorted(
-            zip(scores, documents),
-            key=lambda x: -x[0]
-        )[:top_k]
+        with _phase(timings, "search"):
+            # Both operands are C-contiguous fp32 -> a single BLAS sgemv
+            scores = np.dot(doc_embeddings, query_embedding)
 
-        results = []
-        for score, doc in ranked:
-            summary = self._build_full_sentence_summary(doc["text"])
+            # O(N) top-k selection, then sort only the k winners
+            k = min(top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
 
-            results.append({
-                "pmcid": doc["pmcid"],
-                "section": doc["section"],
-                "score": float(score),
-                "summary": summary,
-                "link": f"https://pmc.ncbi.nlm.nih.gov/articles/{doc['pmcid']}/"
-            })
+            results = [
+                self._format_result(documents[i], scores[i]) for i in top
+            ]
 
         return {
             "query": query,
             "retrieved_at": datetime.now(timezone.utc).isoformat(),
             "results": results
         }
+
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[Dict]:
+        """
+        Search many queries at once, returning one `search`-shaped
+        response per query.
+
+        With the persisted index, all query embeddings come from a single
+        encoder forward pass and a single index lookup. The live path has
+        no shared work and simply runs each query in turn; concurrent
+        callers should call `search` per query instead.
+        """
+        if self.index is None:
+            return [self.search(query, top_k) for query in queries]
+
+        query_embeddings = self._embed_queries(queries)
+        retrieved_at = datetime.now(timezone.utc).isoformat()
+
+        return [
+            {
+                "query": query,
+                "retrieved_at": retrieved_at,
+                "results": results
+            }
+            for query, results in zip(
+                queries, self._search_index(query_embeddings, top_k)
+            )
+        ]
+
+    def close(self):
+        """
+        Release the HTTP client, I/O loop and embedding cache.
+        """
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self.cache.close()